@@ -5,10 +5,12 @@ from datetime import datetime, timezone
 import logging
 import os
 
+import click
 from flask import Flask, send_from_directory
 from flask_assets import Environment, Bundle
 from flask_compress import Compress
 from flask_talisman import Talisman
+from jinja2 import FileSystemBytecodeCache
 
 import sentry_sdk as sentry
 from sentry_sdk.integrations.flask import FlaskIntegration as SentryFlaskIntegration
@@ -20,6 +22,9 @@ from util import format_date, format_value
 
 from portfolio.views import portfolio as portfolio_blueprint
 from portfolio.blog import blog_manager
+from portfolio.downloads import download_manager
+from portfolio.images import image_manager
+from portfolio.profiling import request_profiler
 from portfolio.project_feed import project_feed_manager
 from portfolio.mail import email_manager
 
@@ -65,13 +70,16 @@ def create_app(config=None) -> Flask:
     '''
     app = Flask(__name__)
     portfolio = PortfolioBuilder(app, [
+        configure_profiling,
         configure_markdown_and_blog,
         configure_project_feed,
         configure_mailer,
+        configure_downloads,
         configure_compression_and_asset_bundling,
         configure_security,
         configure_monitoring,
-        configure_blueprints
+        configure_blueprints,
+        configure_templates
     ])
 
     if config is None:
@@ -81,11 +89,39 @@ def create_app(config=None) -> Flask:
 
     return app
 
+def configure_profiling(app: Flask) -> Flask:
+    app.logger.debug('Configuring request profiling...')
+
+    slow_request_threshold = app.config['PROFILING_SLOW_REQUEST_THRESHOLD']
+
+    request_profiler.initialise(
+        output_path=app.config['PROFILING_OUTPUT_PATH'],
+        sample_rate=float(app.config['PROFILING_SAMPLE_RATE']),
+        token=app.config['PROFILING_TOKEN'],
+        slow_request_threshold=float(slow_request_threshold) if slow_request_threshold else None,
+        interval=float(app.config['PROFILING_INTERVAL']) / 1000,
+        max_files=int(app.config['PROFILING_MAX_FILES'])
+    )
+
+    # Registered first so that the time spent in any other request hooks is included
+    if request_profiler.enabled:
+        request_profiler.register(app)
+
+    return app
+
 def configure_markdown_and_blog(app: Flask) -> Flask:
     app.logger.debug('Configuring markdown support...')
 
     parser = md.Markdown(extensions=['markdown.extensions.fenced_code', 'markdown.extensions.meta'])
 
+    app.logger.debug('Configuring responsive images...')
+
+    image_manager.initialise(
+        static_folder=app.static_folder,
+        static_url_path=app.static_url_path,
+        output_path=app.config['IMAGE_DERIVATIVES_PATH']
+    )
+
     app.logger.debug('Configuring blog manager...')
 
     # Configure the blog
@@ -97,7 +133,8 @@ def configure_markdown_and_blog(app: Flask) -> Flask:
     blog_manager.initialise(
         path=app.config['POSTS_PATH'],
         parser=parser,
-        max_cache_age=ONE_DAY
+        max_cache_age=ONE_DAY,
+        images=image_manager
     )
 
     # Custom Jinja filters for the blog
@@ -110,7 +147,8 @@ def configure_project_feed(app: Flask) -> Flask:
     app.logger.debug('Configuring project feed...')
 
     project_feed_manager.initialise(
-        path=app.config['PROJECT_FEED_PATH']
+        path=app.config['PROJECT_FEED_PATH'],
+        check_interval=float(app.config['PROJECT_FEED_CHECK_INTERVAL'])
     )
 
     return app
@@ -118,15 +156,30 @@ def configure_project_feed(app: Flask) -> Flask:
 def configure_mailer(app: Flask) -> Flask:
     email_manager.initialise(
         api_key=app.config['SENDGRID_API_KEY'],
-        default_from= app.config['SENDGRID_DEFAULT_FROM']
+        default_from= app.config['SENDGRID_DEFAULT_FROM'],
+        host=app.config['SENDGRID_API_HOST']
     )
 
     return app
  
+def configure_downloads(app: Flask) -> Flask:
+    app.logger.debug('Configuring downloads...')
+
+    download_manager.initialise(
+        static_folder=app.static_folder,
+        accel_redirect_prefix=app.config['DOWNLOADS_ACCEL_REDIRECT_PREFIX']
+    )
+
+    # Hash the downloadable files up front so no request has to wait on it
+    download_manager.precompute_etags()
+
+    return app
+
 def configure_compression_and_asset_bundling(app: Flask) -> Flask:
     app.logger.debug('Configuring compression for static files...')
 
-    # Enable Flask-Compress for gzipping static files
+    # Enable Flask-Compress for gzipping static files.
+    # Only the types in COMPRESS_MIMETYPES are compressed, so already-compressed files (e.g. PDFs, images) are left as is.
     Compress(app)
 
     app.logger.debug('Configuring asset bundling...')
@@ -227,3 +280,43 @@ def configure_blueprints(app: Flask) -> Flask:
     app.register_blueprint(portfolio_blueprint)
 
     return app
+
+def configure_templates(app: Flask) -> Flask:
+    app.logger.debug('Configuring templates...')
+
+    bytecode_cache_path = app.config['TEMPLATE_BYTECODE_CACHE_PATH']
+
+    if bytecode_cache_path:
+        # Compiled templates are persisted so that they can be shared between workers and restarts,
+        # rather than every worker compiling each template from source on first use.
+        os.makedirs(bytecode_cache_path, exist_ok=True)
+
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(bytecode_cache_path)
+
+    def compile_templates():
+        ''' Compiles all templates, populating the template bytecode cache. '''
+        if not bytecode_cache_path:
+            raise click.ClickException('TEMPLATE_BYTECODE_CACHE_PATH must be set for compiled templates to be persisted.')
+
+        count = precompile_templates(app)
+
+        click.echo('Compiled {} templates to {}'.format(count, bytecode_cache_path))
+
+    app.cli.command('compile-templates')(compile_templates)
+
+    if app.config['TEMPLATE_PRECOMPILE']:
+        # This runs last so that the filters and extensions used by the templates have been registered
+        count = precompile_templates(app)
+
+        app.logger.debug('Precompiled {} templates'.format(count))
+
+    return app
+
+def precompile_templates(app: Flask) -> int:
+    ''' Loads every template so that they're compiled (and cached) before they are first rendered. '''
+    names = app.jinja_env.list_templates()
+
+    for name in names:
+        app.jinja_env.get_template(name)
+
+    return len(names)
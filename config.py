@@ -4,7 +4,25 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 
 DEFAULT_POSTS_PATH = 'static/assets/posts/'
 DEFAULT_PROJECT_FEED_PATH = 'static/assets/projects/project_feed.json'
+DEFAULT_IMAGE_DERIVATIVES_PATH = 'assets/images/derived/'
 DEFAULT_POSTS_PER_PAGE = 10
+DEFAULT_PROJECT_FEED_CHECK_INTERVAL = 5
+DEFAULT_PROFILING_OUTPUT_PATH = 'profiles/'
+DEFAULT_PROFILING_SAMPLE_RATE = 0
+DEFAULT_PROFILING_INTERVAL = 5
+DEFAULT_PROFILING_MAX_FILES = 100
+DEFAULT_COMPRESS_MIMETYPES = [
+    'application/javascript',
+    'application/json',
+    'image/svg+xml',
+    'text/css',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+    'text/xml'
+]
+DEFAULT_SENDGRID_API_HOST = 'https://api.sendgrid.com'
+DEFAULT_RECAPTCHA_VERIFY_SERVER = 'https://www.google.com/recaptcha/api/siteverify'
 DEFAULT_RECAPTCHA_DATA_ATTRS = {'theme': 'dark'}
 DEFAULT_CONTENT_SECURITY_POLICY = {
     'default-src': '\'self\' *.spotify.com *.google.com disqus.com *.disqus.com *.disquscdn.com',
@@ -25,18 +43,30 @@ class Config:
     POSTS_PATH = os.environ.get('POSTS_PATH', DEFAULT_POSTS_PATH)
     POSTS_PER_PAGE = os.environ.get('POSTS_PER_PAGE', DEFAULT_POSTS_PER_PAGE)
 
+    # Images
+    IMAGE_DERIVATIVES_PATH = os.environ.get('IMAGE_DERIVATIVES_PATH', DEFAULT_IMAGE_DERIVATIVES_PATH)
+
     # Project feed
     PROJECT_FEED_PATH = os.environ.get('PROJECT_FEED_PATH', DEFAULT_PROJECT_FEED_PATH)
+    PROJECT_FEED_CHECK_INTERVAL = os.environ.get('PROJECT_FEED_CHECK_INTERVAL', DEFAULT_PROJECT_FEED_CHECK_INTERVAL)
+
+    # Downloads
+    DOWNLOADS_ACCEL_REDIRECT_PREFIX = os.environ.get('DOWNLOADS_ACCEL_REDIRECT_PREFIX')
+
+    # Compression
+    COMPRESS_MIMETYPES = DEFAULT_COMPRESS_MIMETYPES
 
     # Email
     SENDGRID_API_KEY = os.environ['SENDGRID_API_KEY']
     SENDGRID_DEFAULT_FROM = os.environ['SENDGRID_DEFAULT_FROM']
+    SENDGRID_API_HOST = os.environ.get('SENDGRID_API_HOST', DEFAULT_SENDGRID_API_HOST)
     CONTACT_EMAIL = os.environ['CONTACT_EMAIL']
 
     # ReCaptcha
     RECAPTCHA_PUBLIC_KEY = os.environ['RECAPTCHA_PUBLIC_KEY']
     RECAPTCHA_PRIVATE_KEY = os.environ['RECAPTCHA_PRIVATE_KEY']
     RECAPTCHA_DATA_ATTRS = os.environ.get('RECAPTCHA_DATA_ATTRS', DEFAULT_RECAPTCHA_DATA_ATTRS)
+    RECAPTCHA_VERIFY_SERVER = os.environ.get('RECAPTCHA_VERIFY_SERVER', DEFAULT_RECAPTCHA_VERIFY_SERVER)
 
     # Logging
     LOG_LEVEL = os.environ['LOG_LEVEL']
@@ -44,6 +74,18 @@ class Config:
     # Monitoring 
     SENTRY_DSN = os.environ['SENTRY_DSN']
 
+    # Profiling
+    PROFILING_OUTPUT_PATH = os.environ.get('PROFILING_OUTPUT_PATH', DEFAULT_PROFILING_OUTPUT_PATH)
+    PROFILING_SAMPLE_RATE = os.environ.get('PROFILING_SAMPLE_RATE', DEFAULT_PROFILING_SAMPLE_RATE)
+    PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+    PROFILING_SLOW_REQUEST_THRESHOLD = os.environ.get('PROFILING_SLOW_REQUEST_THRESHOLD')
+    PROFILING_INTERVAL = os.environ.get('PROFILING_INTERVAL', DEFAULT_PROFILING_INTERVAL)
+    PROFILING_MAX_FILES = os.environ.get('PROFILING_MAX_FILES', DEFAULT_PROFILING_MAX_FILES)
+
+    # Templates
+    TEMPLATE_BYTECODE_CACHE_PATH = os.environ.get('TEMPLATE_BYTECODE_CACHE_PATH')
+    TEMPLATE_PRECOMPILE = os.environ.get('TEMPLATE_PRECOMPILE', 'false').lower() == 'true'
+
     # Security
     CONTENT_SECURITY_POLICY = os.environ.get('CONTENT_SECURITY_POLICY', DEFAULT_CONTENT_SECURITY_POLICY)
 
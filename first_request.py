@@ -0,0 +1,110 @@
+from typing import Any, Dict, List
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_RUNS = 5
+DEFAULT_OUTPUT = 'first-request-results.json'
+DEFAULT_PATHS = ['/', '/blog/', '/blog/tag/personal/', '/missing/']
+
+# The template settings used in each mode, with the bytecode cache path filled in for the modes that use it.
+MODES = {
+    'no_cache': {},
+    'bytecode_cache': {'TEMPLATE_BYTECODE_CACHE_PATH': None},
+    'precompiled': {'TEMPLATE_BYTECODE_CACHE_PATH': None, 'TEMPLATE_PRECOMPILE': 'true'}
+}
+
+def measure(paths: List[str]) -> Dict[str, Any]:
+    ''' Measures how long the app takes to start, and to serve the first request to each path (run in a fresh process). '''
+    from loadtest import FakeServices, configure_environment
+
+    fake_services = FakeServices()
+    fake_services.start()
+
+    configure_environment(fake_services)
+
+    started = time.perf_counter()
+
+    from app import create_app
+
+    app = create_app()
+    startup = time.perf_counter() - started
+    client = app.test_client()
+    first_requests = {}
+
+    for path in paths:
+        started = time.perf_counter()
+        client.get(path, headers={'X-Forwarded-Proto': 'https'})
+        first_requests[path] = (time.perf_counter() - started) * 1000
+
+    return {'startup_ms': startup * 1000, 'first_request_ms': first_requests}
+
+def run(mode: str, cache_path: str, paths: List[str]) -> Dict[str, Any]:
+    env = dict(os.environ, LOG_LEVEL='ERROR')
+    env.pop('TEMPLATE_BYTECODE_CACHE_PATH', None)
+    env.pop('TEMPLATE_PRECOMPILE', None)
+
+    for key, value in MODES[mode].items():
+        env[key] = cache_path if value is None else value
+
+    output = subprocess.run(
+        [sys.executable, __file__, '--measure'] + ['--path={}'.format(p) for p in paths],
+        env=env, check=True, capture_output=True, text=True).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
+
+def summarise(measurements: List[Dict[str, Any]], paths: List[str]) -> Dict[str, Any]:
+    return {
+        'startup_ms': statistics.median(m['startup_ms'] for m in measurements),
+        'first_request_ms': {p: statistics.median(m['first_request_ms'][p] for m in measurements) for p in paths},
+        'runs': measurements
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures first-request latency of new workers, with and without the template bytecode cache.')
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help='Number of fresh processes to measure for each mode.')
+    parser.add_argument('--path', action='append', dest='paths', help='Path to request (can be repeated).')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Path to write the JSON results to.')
+    parser.add_argument('--measure', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    paths = args.paths or DEFAULT_PATHS
+
+    if args.measure:
+        print(json.dumps(measure(paths)))
+        return
+
+    logging.basicConfig(level=logging.INFO)
+
+    cache_path = tempfile.mkdtemp(prefix='portfolio-jinja-')
+    results = {}
+
+    try:
+        # Populate the cache once, as a previous worker (or the compile-templates command) would have done
+        run('precompiled', cache_path, paths)
+
+        for mode in MODES:
+            measurements = [run(mode, cache_path, paths) for _ in range(args.runs)]
+            results[mode] = summarise(measurements, paths)
+
+            logging.info('{:<15} startup {:>7.1f}ms  first requests {}'.format(
+                mode,
+                results[mode]['startup_ms'],
+                '  '.join('{} {:.1f}ms'.format(p, ms) for (p, ms) in results[mode]['first_request_ms'].items())))
+    finally:
+        shutil.rmtree(cache_path, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=4)
+
+    logging.info('Results written to {}'.format(args.output))
+
+if __name__ == '__main__':
+    main()
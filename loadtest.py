@@ -0,0 +1,324 @@
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib import error, parse, request as http
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import time
+
+# Represents a request made by the load test: (method, path, form data).
+LoadTestRequest = Tuple[str, str, Optional[Dict[str, str]]]
+Scenario = Callable[[random.Random], LoadTestRequest]
+
+DEFAULT_MIX = 'home=20,blog=15,post=30,tag=10,not_found=15,contact=10'
+DEFAULT_CONCURRENCY = [1, 4, 16]
+DEFAULT_REQUESTS = 1000
+DEFAULT_OUTPUT = 'loadtest-results.json'
+
+# Paths commonly probed by scanners, used to exercise the 404 handling.
+SCAN_PATHS = ['/wp-login.php', '/.env', '/admin/', '/phpmyadmin/', '/.git/config', '/xmlrpc.php', '/blog/2000/01/01/missing']
+
+# Scenarios that need a specific route, which may not exist in every build of the app: (path, method).
+SCENARIO_ROUTES = {
+    'contact': ('/contact/', 'POST')
+}
+
+class FakeServicesHandler(BaseHTTPRequestHandler):
+    ''' Stands in for SendGrid, the ReCaptcha verification API and Sentry, accepting any request. '''
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.handle_request()
+
+    def handle_request(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+
+        if self.path.startswith('/recaptcha/'):
+            service, status, body = 'recaptcha', 200, {'success': True}
+        elif self.path.startswith('/v3/mail/send'):
+            service, status, body = 'sendgrid', 202, {}
+        else:
+            service, status, body = 'sentry', 200, {}
+
+        self.server.record(service)
+
+        payload = json.dumps(body).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # Don't log every request to stderr
+        pass
+
+class FakeServices(ThreadingHTTPServer):
+    ''' A local HTTP server for the fake external services, which counts the calls made to each service. '''
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeServicesHandler)
+        self.calls: Counter = Counter()
+        self.calls_lock = Lock()
+
+    @property
+    def url(self) -> str:
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def record(self, service: str):
+        with self.calls_lock:
+            self.calls[service] += 1
+
+    def start(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+
+class NoRedirects(http.HTTPRedirectHandler):
+    ''' Records redirects as responses rather than following them. '''
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+def configure_environment(fake_services: FakeServices):
+    ''' Points the app's external services at the fakes, and fills in any other required settings. '''
+    os.environ['SENDGRID_API_HOST'] = fake_services.url
+    os.environ['RECAPTCHA_VERIFY_SERVER'] = fake_services.url + '/recaptcha/api/siteverify'
+    os.environ['SENTRY_DSN'] = 'http://public@127.0.0.1:{}/1'.format(fake_services.server_address[1])
+
+    defaults = {
+        'SECRET_KEY': 'load-test',
+        'SENDGRID_API_KEY': 'load-test',
+        'SENDGRID_DEFAULT_FROM': 'load-test@example.com',
+        'CONTACT_EMAIL': 'load-test@example.com',
+        'RECAPTCHA_PUBLIC_KEY': 'load-test',
+        'RECAPTCHA_PRIVATE_KEY': 'load-test',
+        'LOG_LEVEL': 'WARNING'
+    }
+
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+
+def create_scenarios(blog_manager: Any, posts_per_page: int) -> Dict[str, Scenario]:
+    ''' Creates the scenarios that make up the traffic mix, using the posts the app has loaded. '''
+    posts, count = blog_manager.get_range(0, 0)
+    pages = max(1, -(-count // posts_per_page))
+    tags = sorted({tag for post in posts for tag in post['tags']})
+
+    return {
+        'home': lambda r: ('GET', '/', None),
+        'blog': lambda r: ('GET', '/blog/page/{}/'.format(r.randint(1, pages)), None),
+        'post': lambda r: ('GET', '/blog/' + r.choice(posts).route, None),
+        'tag': lambda r: ('GET', '/blog/tag/{}/'.format(parse.quote(r.choice(tags), safe='')), None),
+        'not_found': lambda r: ('GET', r.choice(SCAN_PATHS), None),
+        'contact': lambda r: ('POST', '/contact/', {
+            'name': 'Load Test',
+            'email': 'load-test@example.com',
+            'message': 'Message {}'.format(r.randint(0, 1_000_000)),
+            'g-recaptcha-response': 'load-test'
+        })
+    }
+
+def find_unsupported(app: Any, weights: Dict[str, float]) -> List[str]:
+    ''' Finds the scenarios in the traffic mix whose route the app does not provide. '''
+    adapter = app.url_map.bind('localhost')
+
+    return sorted(
+        name for (name, (path, method)) in SCENARIO_ROUTES.items()
+        if name in weights and not adapter.test(path, method)
+    )
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        weights[name.strip()] = float(weight or 1)
+
+    return weights
+
+def send(opener: http.OpenerDirector, base_url: str, load_test_request: LoadTestRequest) -> int:
+    method, path, data = load_test_request
+    body = parse.urlencode(data).encode('utf-8') if data is not None else None
+    # Talisman redirects plain HTTP requests, so present them as if they came through a TLS-terminating proxy.
+    req = http.Request(base_url + path, data=body, method=method, headers={'X-Forwarded-Proto': 'https'})
+
+    try:
+        with opener.open(req, timeout=30) as response:
+            response.read()
+
+            return response.status
+    except error.HTTPError as e:
+        e.read()
+
+        return e.code
+
+def percentile(latencies: List[float], p: int) -> float:
+    if len(latencies) == 1:
+        return latencies[0]
+
+    return statistics.quantiles(latencies, n=100, method='inclusive')[p - 1]
+
+def run_level(base_url: str, scenarios: Dict[str, Scenario], weights: Dict[str, float],
+              concurrency: int, requests: int, seed: int) -> Dict[str, Any]:
+    ''' Sends ``requests`` requests from ``concurrency`` concurrent clients, summarising the results per route. '''
+    names = list(weights)
+    samples: Dict[str, List[Tuple[float, Optional[int]]]] = defaultdict(list)
+    samples_lock = Lock()
+
+    def client(index: int):
+        r = random.Random(seed * 1000 + index)
+        opener = http.build_opener(NoRedirects)
+        share = requests // concurrency + (1 if index < requests % concurrency else 0)
+
+        for _ in range(share):
+            name = r.choices(names, weights=[weights[n] for n in names])[0]
+            started = time.perf_counter()
+
+            try:
+                status = send(opener, base_url, scenarios[name](r))
+            except OSError:
+                status = None
+
+            elapsed = time.perf_counter() - started
+
+            with samples_lock:
+                samples[name].append((elapsed, status))
+
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(client, range(concurrency)))
+
+    duration = time.perf_counter() - started
+    routes = {}
+
+    for name, route_samples in sorted(samples.items()):
+        latencies = sorted(elapsed * 1000 for (elapsed, _) in route_samples)
+        statuses = Counter(str(status) for (_, status) in route_samples)
+
+        routes[name] = {
+            'requests': len(route_samples),
+            'errors': sum(1 for (_, status) in route_samples if status is None or status >= 500),
+            'statuses': dict(statuses),
+            'throughput': len(route_samples) / duration,
+            'latency_ms': {
+                'mean': statistics.fmean(latencies),
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': latencies[-1]
+            }
+        }
+
+    return {
+        'concurrency': concurrency,
+        'requests': sum(len(s) for s in samples.values()),
+        'duration_seconds': duration,
+        'throughput': sum(len(s) for s in samples.values()) / duration,
+        'routes': routes
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Load tests the portfolio app locally, with stand-ins for SendGrid, ReCaptcha and Sentry.')
+    parser.add_argument('--concurrency', action='append', type=int, help='Number of concurrent clients (can be repeated). Default is 1, 4 and 16.')
+    parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS, help='Number of requests to send at each concurrency level.')
+    parser.add_argument('--warmup', type=int, default=50, help='Number of requests to send before measuring.')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Weighted traffic mix, e.g. "home=20,post=30,contact=10". Default is "{}".'.format(DEFAULT_MIX))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--label', default=None, help='Label for the results (e.g. the build being tested).')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Path to write the JSON results to.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    fake_services = FakeServices()
+    fake_services.start()
+
+    configure_environment(fake_services)
+
+    # The app can only be imported once the environment has been configured, as ``Config`` reads it on import.
+    from werkzeug.serving import make_server
+
+    from app import create_app
+    from config import Config
+    from portfolio.blog import blog_manager
+
+    class LoadTestConfig(Config):
+        # The load test has no browser session to take a CSRF token from.
+        WTF_CSRF_ENABLED = False
+
+    app = create_app(LoadTestConfig)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    # Don't log every request the load test makes
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    Thread(target=server.serve_forever, daemon=True).start()
+    base_url = 'http://127.0.0.1:{}'.format(server.server_port)
+
+    weights = parse_mix(args.mix)
+    scenarios = create_scenarios(blog_manager, int(app.config['POSTS_PER_PAGE']))
+    unknown = set(weights) - set(scenarios)
+
+    if unknown:
+        parser.error('Unknown routes in traffic mix: {}'.format(', '.join(sorted(unknown))))
+
+    # Requests to a missing route would only measure the 404 page (which responds with a 200), so leave them out.
+    unsupported = find_unsupported(app, weights)
+
+    for name in unsupported:
+        logging.warning('The app has no route for {} - removing it from the traffic mix'.format(name))
+
+        del weights[name]
+
+    if not weights:
+        parser.error('None of the routes in the traffic mix are supported by the app.')
+
+    logging.info('Warming up with {} requests...'.format(args.warmup))
+
+    run_level(base_url, scenarios, weights, 1, args.warmup, args.seed)
+
+    levels = []
+
+    for concurrency in args.concurrency or DEFAULT_CONCURRENCY:
+        logging.info('Sending {} requests with {} concurrent clients...'.format(args.requests, concurrency))
+
+        level = run_level(base_url, scenarios, weights, concurrency, args.requests, args.seed)
+        levels.append(level)
+
+        for name, route in level['routes'].items():
+            logging.info('  {:<10} {:>6} req  {:>8.1f} req/s  p50 {:>7.1f}ms  p95 {:>7.1f}ms  p99 {:>7.1f}ms  errors {}'.format(
+                name, route['requests'], route['throughput'],
+                route['latency_ms']['p50'], route['latency_ms']['p95'], route['latency_ms']['p99'], route['errors']))
+
+    server.shutdown()
+
+    results = {
+        'label': args.label,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'mix': weights,
+        'unsupported': unsupported,
+        'levels': levels,
+        'fake_service_calls': dict(fake_services.calls)
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=4)
+
+    logging.info('Results written to {}'.format(args.output))
+
+if __name__ == '__main__':
+    main()
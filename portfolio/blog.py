@@ -1,7 +1,8 @@
+from bisect import bisect_left
 from collections import OrderedDict
 from markdown import Markdown
 from threading import Lock
-from typing import Optional, Text, Tuple, List, Callable
+from typing import Dict, Optional, Text, Tuple, List, Callable
 
 import codecs
 import datetime
@@ -10,7 +11,11 @@ import os
 import time
 import uuid
 
+from .images import ImageDerivatives
 from .models import Post
+from .related_posts import RelatedPosts
+
+DEFAULT_RELATED_POSTS_COUNT = 3
 
 class BlogNotInitialisedException(Exception):
     pass
@@ -30,23 +35,34 @@ class Blog:
         The posts are stored so that a caller can query for specific posts, range of posts, or posts which match a tag.
 
         Loading of posts is done on demand and cached, with automatic cache invalidation after a certain time.
+
+        The most related posts for each post (by shared tags) are worked out while loading, and only
+        updated for the posts which have changed when the cache is reloaded.
     '''
 
     def __init__(self):
         self._cache: OrderedDict[str, Post] = OrderedDict()
+        # Posts in the same (newest first) order as the cache, and their routes in ascending order.
+        # These are held together so that they're always replaced at the same time.
+        self._ordered: Tuple[List[Post], List[str]] = ([], [])
+        self.related_posts = RelatedPosts(DEFAULT_RELATED_POSTS_COUNT)
         self.path: Optional[Text] = None
         self.parser: Optional[Markdown] = None
+        self.images: Optional[ImageDerivatives] = None
         self.cache_age_seconds: float = 0.0
         self.max_cache_age: int = -1
         self.loading_lock = Lock()
         self.loaded: bool = False
         self.initialised = False
 
-    def initialise(self, path: Text, parser: Markdown, max_cache_age: int):
+    def initialise(self, path: Text, parser: Markdown, max_cache_age: int, related_posts_count: int = DEFAULT_RELATED_POSTS_COUNT,
+                   images: Optional[ImageDerivatives] = None):
         '''  Initialises the blog. '''
         self.path = path
         self.parser = parser
+        self.images = images
         self.max_cache_age = max_cache_age
+        self.related_posts = RelatedPosts(related_posts_count)
         self.initialised = True  
 
     def check_loaded(self):
@@ -67,6 +83,7 @@ class Blog:
             logging.debug('Clearing cached blog posts...')
 
             self._cache = OrderedDict()
+            self._ordered = ([], [])
             self.loaded = False
             
             self._load()
@@ -85,12 +102,37 @@ class Blog:
         self.check_loaded()
         self.maybe_clear_cache()
 
-        posts = list(self._cache.values())
+        posts, _ = self._ordered
 
         if limit:
             return posts[skip:skip+limit], len(posts)
 
-        return posts, len(posts)
+        return list(posts), len(posts)
+
+    def get_older_than(self, cursor: Optional[str], limit: int) -> Tuple[List[Post], Optional[str]]:
+        ''' Fetches up to ``limit`` posts that are older than the post with the route ``cursor``.
+
+            Unlike ``get_range()``, the range is anchored to a post rather than an offset, so the
+            results are stable while new posts are added and the cost does not depend on how deep
+            into the archive the range is. When ``cursor`` is ``None`` the newest posts are returned.
+
+            Along with the posts, a cursor for the next range is returned (or ``None`` when there
+            are no older posts).
+        '''
+
+        self.check_loaded()
+        self.maybe_clear_cache()
+
+        # Routes start with the zero-padded post date, so ordering by route is ordering by date.
+        ordered_posts, routes = self._ordered
+        end = len(routes) if cursor is None else bisect_left(routes, cursor)
+        start = max(0, end - limit)
+
+        # The posts are in the reverse order of the routes, so the range can be taken from them directly.
+        posts = ordered_posts[len(routes) - end:len(routes) - start]
+        next_cursor = posts[-1].route if posts and start > 0 else None
+
+        return posts, next_cursor
 
     def get(self, key: str) -> Post:
         ''' Returns the post identified by the key given. '''
@@ -100,6 +142,14 @@ class Blog:
 
         return self._cache[key]
 
+    def get_related(self, post: Post) -> List[Post]:
+        ''' Returns the posts most related to the post given, most related first. '''
+
+        self.check_loaded()
+        self.maybe_clear_cache()
+
+        return [self._cache[route] for route in self.related_posts.get(post.route) if route in self._cache]
+
     def get_matching(self, predicate: Callable[[Post], bool]) -> List[Post]:
         ''' Gets all posts matching the specified predicate. '''
 
@@ -144,14 +194,36 @@ class Blog:
 
                     blog_posts[post.route] = post
 
-            blog_posts = sorted(blog_posts.items(), key=lambda i: i[1].metadata_date, reverse=True)
+            self._update_related_posts(blog_posts)
+
+            # Routes start with the post date, so this orders by date (newest first), then by slug.
+            blog_posts = sorted(blog_posts.items(), key=lambda i: i[0], reverse=True)
 
             for route, post in blog_posts:
                 self._cache[route] = post
 
+            self._ordered = (list(self._cache.values()), list(reversed(self._cache.keys())))
+
             self.cache_age_seconds = time.time()
             self.loaded = True
 
+    def _update_related_posts(self, blog_posts: Dict[str, Post]):
+        ''' Brings the related posts up to date with the posts loaded, only revisiting posts which have changed. '''
+        if not self.related_posts.routes():
+            # Nothing has been loaded yet, so work out the related posts of every post at once.
+            self.related_posts.build({route: post['tags'] for (route, post) in blog_posts.items()})
+            return
+
+        for route in list(self.related_posts.routes()):
+            if route not in blog_posts:
+                self.related_posts.remove(route)
+
+        for route, post in blog_posts.items():
+            tags = frozenset(post['tags'])
+
+            if self.related_posts.tags(route) != tags:
+                self.related_posts.add(route, tags)
+
     def create_post(self, filename: str) -> Post:
         # Get system info about the file
         st = os.stat(self.path + filename)
@@ -170,6 +242,11 @@ class Blog:
 
         # Use the markdown parser to parse convert the raw text to HTML and collect metadata.
         html = self.parser.convert(text)
+
+        if self.images is not None:
+            # Serve responsive derivatives (with dimensions) for any images that have them.
+            html = self.images.rewrite(html)
+
         meta.update({k: v[0] for (k, v) in self.parser.Meta.items()})
 
         # Split tags into list
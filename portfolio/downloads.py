@@ -0,0 +1,112 @@
+from flask import Response, request, send_from_directory
+from threading import Lock
+from typing import Dict, Iterable, Optional, Text, Tuple
+from urllib.parse import quote
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+import hashlib
+import logging
+import mimetypes
+import os
+import posixpath
+
+DEFAULT_DOWNLOAD_PATHS = ('assets/cv/', 'assets/thesis/', 'assets/posts/')
+HASH_CHUNK_SIZE = 1024 * 1024
+
+class DownloadsNotInitialisedException(Exception):
+    pass
+
+class Downloads:
+    ''' Serves large static files (e.g. CV/thesis PDFs and raw blog posts) for download.
+
+        Files are served with a strong ``ETag`` derived from their content, which is computed once per
+        version of the file rather than per request, and support single range requests so that downloads
+        can be resumed. The file is handed to the WSGI server's ``wsgi.file_wrapper`` (allowing ``sendfile``)
+        or, when an internal redirect prefix is configured, to a front proxy via ``X-Accel-Redirect``.
+    '''
+
+    def __init__(self):
+        # Maps a file's path to its content ETag, along with the (mtime, size) the ETag was computed for.
+        self._etags: Dict[Text, Tuple[Tuple[int, int], str]] = {}
+        self.static_folder: Optional[Text] = None
+        self.paths: Tuple[Text, ...] = ()
+        self.accel_redirect_prefix: Optional[Text] = None
+        self.hashing_lock = Lock()
+        self.initialised = False
+
+    def initialise(self, static_folder: Text, paths: Iterable[Text] = DEFAULT_DOWNLOAD_PATHS, accel_redirect_prefix: Optional[Text] = None):
+        ''' Initialises the downloads. '''
+        self.static_folder = static_folder
+        self.paths = tuple(p.rstrip('/') + '/' for p in paths)
+        self.accel_redirect_prefix = accel_redirect_prefix.rstrip('/') + '/' if accel_redirect_prefix else None
+        self.initialised = True
+
+    def precompute_etags(self):
+        ''' Computes the ETags for every file available for download ahead of the first request. '''
+        for path in self.paths:
+            for directory, _, filenames in os.walk(os.path.join(self.static_folder, path)):
+                for filename in filenames:
+                    self.get_etag(os.path.join(directory, filename))
+
+    def get_etag(self, full_path: Text) -> str:
+        ''' Gets the ETag for a file, only hashing its content again if the file has changed. '''
+        st = os.stat(full_path)
+        signature = (st.st_mtime_ns, st.st_size)
+        cached = self._etags.get(full_path)
+
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        with self.hashing_lock:
+            logging.debug('Computing ETag for {}'.format(full_path))
+
+            digest = hashlib.sha256()
+
+            with open(full_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+
+            etag = digest.hexdigest()[:32]
+            self._etags[full_path] = (signature, etag)
+
+            return etag
+
+    def send(self, filename: Text) -> Response:
+        ''' Sends the file (relative to the static folder) given, if it is available for download. '''
+        if not self.initialised:
+            raise DownloadsNotInitialisedException('Downloads must first be initialised.')
+
+        # Normalise first so that e.g. ``assets/cv/../images/logo.png`` can't get around the allowed paths.
+        filename = posixpath.normpath(filename)
+
+        if not filename.startswith(self.paths):
+            raise NotFound()
+
+        full_path = safe_join(self.static_folder, filename)
+
+        if full_path is None or not os.path.isfile(full_path):
+            raise NotFound()
+
+        etag = self.get_etag(full_path)
+
+        if self.accel_redirect_prefix is not None:
+            # Let the front proxy serve the file (including any range requests) from its internal location.
+            mimetype, _ = mimetypes.guess_type(filename)
+            response = Response(mimetype=mimetype or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = self.accel_redirect_prefix + quote(filename)
+            response.set_etag(etag)
+
+            return response.make_conditional(request)
+
+        if ',' in request.headers.get('Range', ''):
+            # Multipart range responses aren't supported, so ignore the range and send the whole file (as RFC 7233 allows).
+            request.environ.pop('HTTP_RANGE', None)
+
+        # Werkzeug handles conditional and single range requests, and streams the file via ``wsgi.file_wrapper``.
+        response = send_from_directory(self.static_folder, filename, etag=etag, conditional=True)
+        response.headers.setdefault('Accept-Ranges', 'bytes')
+
+        return response
+
+download_manager = Downloads()
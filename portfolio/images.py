@@ -0,0 +1,300 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Match, Optional, Text, Tuple
+from urllib.parse import quote, unquote
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+
+from .models import slugify
+
+DEFAULT_SOURCE_PATHS = ('assets/images/', 'assets/posts/')
+DEFAULT_OUTPUT_PATH = 'assets/images/derived/'
+DEFAULT_WIDTHS = (320, 640, 960, 1280, 1920)
+# Listed in order of preference, as browsers use the first <source> they support.
+DEFAULT_FORMATS = ('avif', 'webp')
+MANIFEST_FILENAME = 'manifest.json'
+SOURCE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+EXCLUDED_DIRECTORIES = ('fav',)
+
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp'
+}
+
+# Matches the names of generated derivatives (<slug>-<hash>-<width>.<format>), including partially written ones.
+DERIVATIVE_FILENAME_RE = re.compile(r'^[a-z0-9-]*-[0-9a-f]{16}-[0-9]+\.(avif|webp)(\.tmp)?$')
+
+IMG_TAG_RE = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+ATTRIBUTE_RE = re.compile(r'([\w-]+)\s*=\s*"([^"]*)"')
+
+# Describes a single derivative to generate: source file, output file, format and width.
+DerivativeJob = Tuple[Text, Text, str, int]
+
+class ImageDerivativesNotInitialisedException(Exception):
+    pass
+
+class InvalidOutputPathException(Exception):
+    pass
+
+class ImageDerivatives:
+    ''' Provides responsive versions of images served from the static folder.
+
+        Resized derivatives of each image are generated ahead of time by ``build()`` (see ``python -m portfolio.images``),
+        which also writes a manifest describing them. At runtime, only the manifest is needed to rewrite ``<img>`` tags
+        into a ``<picture>`` offering the derivatives via ``srcset``, along with the image's dimensions.
+    '''
+
+    def __init__(self):
+        self.manifest: Dict[str, Any] = {}
+        self.static_folder: Optional[Text] = None
+        self.static_url_path: Optional[Text] = None
+        self.output_path: Optional[Text] = None
+        self.loaded: bool = False
+        self.initialised = False
+
+    def initialise(self, static_folder: Text, static_url_path: Text, output_path: Text = DEFAULT_OUTPUT_PATH):
+        ''' Initialises the image derivatives. '''
+        self.static_folder = static_folder
+        self.static_url_path = static_url_path.rstrip('/') + '/'
+        self.output_path = output_path
+        self.initialised = True
+
+    @property
+    def manifest_path(self) -> Text:
+        return os.path.join(self.static_folder, self.output_path, MANIFEST_FILENAME)
+
+    def check_loaded(self):
+        if not self.initialised:
+            raise ImageDerivativesNotInitialisedException('Image derivatives must first be initialised.')
+
+        if not self.loaded:
+            self._load()
+
+    def rewrite(self, html: Text) -> Text:
+        ''' Rewrites any ``<img>`` tags in ``html`` which reference an image with derivatives. '''
+        self.check_loaded()
+
+        if not self.manifest:
+            return html
+
+        return IMG_TAG_RE.sub(self._rewrite_tag, html)
+
+    def build(self, source_paths: Iterable[Text] = DEFAULT_SOURCE_PATHS, widths: Iterable[int] = DEFAULT_WIDTHS,
+              formats: Iterable[str] = DEFAULT_FORMATS, workers: Optional[int] = None):
+        ''' Generates derivatives for the images under ``source_paths`` and writes the manifest.
+
+            Derivatives are named after a hash of their source image, so any that already exist are reused,
+            and derivatives which are no longer referenced are removed.
+        '''
+        if not self.initialised:
+            raise ImageDerivativesNotInitialisedException('Image derivatives must first be initialised.')
+
+        source_paths = list(source_paths)
+        output_folder = os.path.join(self.static_folder, self.output_path)
+
+        self._check_output_folder(output_folder, source_paths)
+
+        from PIL import Image
+
+        formats = [f for f in formats if self._is_format_supported(f)]
+        manifest = {}
+        jobs: List[DerivativeJob] = []
+
+        os.makedirs(output_folder, exist_ok=True)
+
+        for key in self._find_sources(source_paths):
+            source = os.path.join(self.static_folder, key)
+
+            with open(source, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:16]
+
+            with Image.open(source) as image:
+                width, height = image.size
+
+            name = '{}-{}'.format(slugify(os.path.splitext(os.path.basename(key))[0]), digest)
+            sizes = sorted({w for w in widths if w < width} | {min(width, max(widths))})
+
+            manifest[key] = {'width': width, 'height': height, 'sources': {}}
+
+            for image_format in formats:
+                derivatives = []
+
+                for size in sizes:
+                    filename = '{}-{}.{}'.format(name, size, image_format)
+                    derivatives.append([self.output_path + filename, size])
+
+                    if not os.path.exists(os.path.join(output_folder, filename)):
+                        jobs.append((source, os.path.join(output_folder, filename), image_format, size))
+
+                manifest[key]['sources'][MIME_TYPES[image_format]] = derivatives
+
+        logging.info('Generating {} image derivatives ({} images)...'.format(len(jobs), len(manifest)))
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(create_derivative, jobs))
+
+        referenced = {os.path.basename(path) for entry in manifest.values() for derivatives in entry['sources'].values() for (path, _) in derivatives}
+
+        for filename in os.listdir(output_folder):
+            path = os.path.join(output_folder, filename)
+
+            # Only generated derivatives are ever removed, never anything else that happens to be in the folder.
+            if filename not in referenced and DERIVATIVE_FILENAME_RE.match(filename) and os.path.isfile(path):
+                logging.debug('Removing stale image derivative {}'.format(filename))
+
+                os.remove(path)
+
+        with open(self.manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=4)
+
+        self.manifest = manifest
+        self.loaded = True
+
+    def _load(self):
+        if os.path.exists(self.manifest_path):
+            logging.debug('Loading image derivative manifest from {}'.format(self.manifest_path))
+
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            # Images will just be served as they are until derivatives have been built.
+            logging.debug('No image derivative manifest found at {}'.format(self.manifest_path))
+
+        self.loaded = True
+
+    def _check_output_folder(self, output_folder: Text, source_paths: List[Text]):
+        ''' Ensures the output folder is separate from the source images, so that they are never removed. '''
+        output_folder = os.path.realpath(output_folder)
+
+        for source_path in source_paths:
+            source_folder = os.path.realpath(os.path.join(self.static_folder, source_path))
+
+            if source_folder == output_folder or source_folder.startswith(output_folder + os.sep):
+                raise InvalidOutputPathException(
+                    'Output path for image derivatives must not be (or contain) a source path - {}'.format(self.output_path))
+
+    def _find_sources(self, source_paths: Iterable[Text]) -> List[Text]:
+        sources = []
+        output_folder = os.path.normpath(os.path.join(self.static_folder, self.output_path))
+
+        for source_path in source_paths:
+            for directory, subdirectories, filenames in os.walk(os.path.join(self.static_folder, source_path)):
+                subdirectories[:] = [
+                    d for d in subdirectories
+                    if d not in EXCLUDED_DIRECTORIES and os.path.normpath(os.path.join(directory, d)) != output_folder
+                ]
+
+                for filename in filenames:
+                    if filename.lower().endswith(SOURCE_EXTENSIONS):
+                        path = os.path.relpath(os.path.join(directory, filename), self.static_folder)
+                        sources.append(path.replace(os.sep, '/'))
+
+        return sorted(sources)
+
+    def _is_format_supported(self, image_format: str) -> bool:
+        from PIL import features
+
+        if image_format == 'avif':
+            try:
+                # Registers the AVIF plugin with Pillow
+                import pillow_avif  # noqa: F401
+            except ImportError:
+                logging.warning('AVIF support is not available - install pillow-avif-plugin to generate AVIF derivatives.')
+                return False
+
+            return True
+
+        return features.check(image_format)
+
+    def _rewrite_tag(self, match: Match) -> Text:
+        tag = match.group(0)
+        attributes = dict(ATTRIBUTE_RE.findall(tag))
+        src = attributes.get('src', '')
+
+        if not src.startswith(self.static_url_path):
+            return tag
+
+        entry = self.manifest.get(unquote(src[len(self.static_url_path):]))
+
+        if entry is None:
+            return tag
+
+        width = self._fill_dimensions(attributes, entry['width'], entry['height'])
+        sizes = '(max-width: {0}px) 100vw, {0}px'.format(width)
+
+        attributes.setdefault('loading', 'lazy')
+        attributes.setdefault('decoding', 'async')
+
+        sources = ''.join(
+            '<source type="{}" srcset="{}" sizes="{}">'.format(
+                mime_type,
+                ', '.join('{}{} {}w'.format(self.static_url_path, quote(path), w) for (path, w) in derivatives),
+                sizes)
+            for (mime_type, derivatives) in entry['sources'].items()
+        )
+        img = '<img {}>'.format(' '.join('{}="{}"'.format(k, v) for (k, v) in attributes.items()))
+
+        return '<picture>{}{}</picture>'.format(sources, img)
+
+    def _fill_dimensions(self, attributes: Dict[str, str], width: int, height: int) -> int:
+        ''' Fills in any missing dimension of an image, keeping its aspect ratio, and returns the width it will be shown at. '''
+        authored_width, authored_height = attributes.get('width'), attributes.get('height')
+
+        if authored_width is None and authored_height is None:
+            attributes['width'], attributes['height'] = str(width), str(height)
+
+            return width
+
+        if authored_height is None and authored_width.isdigit():
+            attributes['height'] = str(max(1, round(int(authored_width) * height / width)))
+        elif authored_width is None and authored_height.isdigit():
+            attributes['width'] = str(max(1, round(int(authored_height) * width / height)))
+
+        # A dimension that isn't a number of pixels (e.g. a percentage) is left as it is.
+        return int(attributes['width']) if attributes.get('width', '').isdigit() else width
+
+def create_derivative(job: DerivativeJob):
+    ''' Resizes a source image to the given width and saves it in the given format. '''
+    from PIL import Image
+
+    source, destination, image_format, width = job
+
+    if image_format == 'avif':
+        import pillow_avif  # noqa: F401
+
+    with Image.open(source) as image:
+        # Palette and greyscale images are converted so they can be resampled smoothly.
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+
+    # Write to a temporary file first so a partially written derivative is never picked up as cached.
+    temporary = destination + '.tmp'
+    resized.save(temporary, format=image_format.upper(), quality=80)
+    os.replace(temporary, destination)
+
+image_manager = ImageDerivatives()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generates responsive image derivatives for images in the static folder.')
+    parser.add_argument('--static-folder', default='static')
+    parser.add_argument('--output-path', default=DEFAULT_OUTPUT_PATH)
+    parser.add_argument('--source', action='append', dest='sources', help='Path (relative to the static folder) to find images in.')
+    parser.add_argument('--width', action='append', dest='widths', type=int, help='Width of a derivative to generate.')
+    parser.add_argument('--format', action='append', dest='formats', choices=sorted(MIME_TYPES), help='Format of the derivatives to generate.')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    image_manager.initialise(static_folder=args.static_folder, static_url_path='/static/', output_path=args.output_path)
+    image_manager.build(
+        source_paths=args.sources or DEFAULT_SOURCE_PATHS,
+        widths=args.widths or DEFAULT_WIDTHS,
+        formats=args.formats or DEFAULT_FORMATS,
+        workers=args.workers)
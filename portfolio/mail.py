@@ -4,17 +4,21 @@ from typing import Optional, Text
 
 import logging
 
+DEFAULT_API_HOST = 'https://api.sendgrid.com'
+
 class Mailer:
     ''' Responsible for sending emails from the portfolio. '''
 
     def __init__(self):
         self.api_key: Optional[str] = None
         self.default_from: Optional[str] = None
+        self.host: str = DEFAULT_API_HOST
 
-    def initialise(self, api_key: str, default_from: str):
+    def initialise(self, api_key: str, default_from: str, host: str = DEFAULT_API_HOST):
         ''' Initialises the mailer. '''
         self.api_key = api_key
         self.default_from = default_from
+        self.host = host
 
     def send_email(self, to: str, subject: str, content: Text):
         ''' Sends an email to the email address provided with the specified subject and content. '''
@@ -24,7 +28,7 @@ class Mailer:
 
     def send_message(self, message: Mail):
         ''' Sends an email message via SendGrid. ''' 
-        sendgrid_client = SendGridAPIClient(self.api_key)
+        sendgrid_client = SendGridAPIClient(self.api_key, host=self.host)
 
         try:            
             logging.debug('Sending email...')
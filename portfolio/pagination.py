@@ -29,13 +29,16 @@ class Pagination:
         
             The parameters control how many page numbers should be generated either side of the current page.
         '''
+        # Only the page numbers in the edge and current windows are visited, rather than every page.
+        windows = sorted([
+            (1, left_edge),
+            (self.page - left_current, self.page + right_current - 1),
+            (self.pages - right_edge + 1, self.pages)
+        ])
         last = 0
 
-        for num in range(1, self.pages + 1):
-            if num <= left_edge or \
-               (num > self.page - left_current - 1 and
-                num < self.page + right_current) or \
-               num > self.pages - right_edge:
+        for start, end in windows:
+            for num in range(max(start, last + 1, 1), min(end, self.pages) + 1):
                 if last + 1 != num:
                     yield None
                 yield num
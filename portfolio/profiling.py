@@ -0,0 +1,202 @@
+from collections import Counter
+from datetime import datetime, timezone
+from flask import Flask, g, request
+from hmac import compare_digest
+from threading import Event, Lock, Thread, get_ident
+from types import FrameType
+from typing import Dict, Optional, Text
+
+import logging
+import os
+import random
+import re
+import sys
+import time
+
+PROFILE_HEADER = 'X-Portfolio-Profile'
+PROFILE_EXTENSION = '.collapsed'
+UNSAFE_FILENAME_RE = re.compile(r'[^A-Za-z0-9_-]+')
+
+class ProfilerNotInitialisedException(Exception):
+    pass
+
+class RequestProfile:
+    ''' The stacks sampled while handling a single request. '''
+
+    def __init__(self, reason: Optional[str]):
+        self.reason = reason
+        self.stacks: Counter = Counter()
+        self.started = time.perf_counter()
+
+class RequestProfiler:
+    ''' Profiles individual requests using a low-overhead sampling profiler.
+
+        A background thread periodically samples the stack of each thread handling a profiled request,
+        so the request itself is not slowed down by tracing every call. A request is profiled when:
+
+        - it is randomly selected, with probability ``sample_rate``;
+        - it carries the ``X-Portfolio-Profile`` header with the configured ``token``; or
+        - it takes longer than ``slow_request_threshold`` milliseconds (when set, every request is sampled
+          so that the profile of a slow request is available once it finishes).
+
+        Profiles are written in the collapsed stack format (as used by ``flamegraph.pl`` and speedscope)
+        to ``output_path``, which is kept to at most ``max_files`` profiles.
+    '''
+
+    def __init__(self):
+        self._profiles: Dict[int, RequestProfile] = {}
+        self._profiles_lock = Lock()
+        self._has_profiles = Event()
+        self._sampler: Optional[Thread] = None
+        self.sample_rate: float = 0.0
+        self.token: Optional[bytes] = None
+        self.slow_request_threshold: Optional[float] = None
+        self.interval: float = 0.005
+        self.output_path: Optional[Text] = None
+        self.max_files: int = 0
+        self.initialised = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.token is not None or self.slow_request_threshold is not None
+
+    def initialise(self, output_path: Text, sample_rate: float = 0.0, token: Optional[str] = None,
+                   slow_request_threshold: Optional[float] = None, interval: float = 0.005, max_files: int = 100):
+        ''' Initialises the profiler. '''
+        self.output_path = output_path
+        self.sample_rate = sample_rate
+        # Kept as bytes so it can be compared to any header value, including non-ASCII ones.
+        self.token = token.encode('utf-8') if token else None
+        self.slow_request_threshold = slow_request_threshold
+        self.interval = interval
+        self.max_files = max_files
+        self.initialised = True
+
+    def register(self, app: Flask):
+        ''' Registers the hooks that start and stop profiling each request. '''
+        if not self.initialised:
+            raise ProfilerNotInitialisedException('Profiler must first be initialised.')
+
+        app.before_request(self.before_request)
+        app.teardown_request(self.teardown_request)
+
+    def before_request(self):
+        reason = None
+
+        if self.token is not None and compare_digest(request.headers.get(PROFILE_HEADER, '').encode('utf-8', 'surrogateescape'), self.token):
+            reason = 'requested'
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            reason = 'sampled'
+        elif self.slow_request_threshold is None:
+            return
+
+        profile = RequestProfile(reason)
+
+        with self._profiles_lock:
+            self._profiles[get_ident()] = profile
+            self._has_profiles.set()
+
+        self._ensure_sampler()
+
+        g.request_profile = profile
+
+    def teardown_request(self, exception: Optional[BaseException]):
+        profile = g.pop('request_profile', None)
+
+        if profile is None:
+            return
+
+        with self._profiles_lock:
+            self._profiles.pop(get_ident(), None)
+
+            if not self._profiles:
+                self._has_profiles.clear()
+
+        duration = (time.perf_counter() - profile.started) * 1000
+        reason = profile.reason
+
+        if reason is None:
+            if duration < self.slow_request_threshold:
+                # Nothing to keep - the request wasn't selected and wasn't slow.
+                return
+
+            reason = 'slow'
+
+        if not profile.stacks:
+            logging.debug('No samples collected for {} request to {} ({:.1f}ms)'.format(reason, request.path, duration))
+            return
+
+        try:
+            self._write(profile, reason, duration)
+        except OSError:
+            logging.exception('Failed to write request profile.')
+
+    def _ensure_sampler(self):
+        if self._sampler is None or not self._sampler.is_alive():
+            with self._profiles_lock:
+                if self._sampler is None or not self._sampler.is_alive():
+                    self._sampler = Thread(target=self._sample, name='request-profiler', daemon=True)
+                    self._sampler.start()
+
+    def _sample(self):
+        while True:
+            # Sleep until there is at least one request to profile
+            self._has_profiles.wait()
+
+            time.sleep(self.interval)
+
+            frames = sys._current_frames()
+
+            with self._profiles_lock:
+                profiles = list(self._profiles.items())
+
+            for thread_id, profile in profiles:
+                frame = frames.get(thread_id)
+
+                if frame is not None:
+                    profile.stacks[self._collapse(frame)] += 1
+
+            del frames
+
+    def _collapse(self, frame: Optional[FrameType]) -> str:
+        names = []
+
+        while frame is not None:
+            code = frame.f_code
+            names.append('{}:{}'.format(frame.f_globals.get('__name__', code.co_filename), code.co_name))
+            frame = frame.f_back
+
+        return ';'.join(reversed(names))
+
+    def _write(self, profile: RequestProfile, reason: str, duration: float):
+        os.makedirs(self.output_path, exist_ok=True)
+
+        filename = '{}-{}-{}-{}-{}ms{}'.format(
+            datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f'),
+            reason,
+            request.method,
+            UNSAFE_FILENAME_RE.sub('_', request.path).strip('_')[:80] or 'root',
+            int(duration),
+            PROFILE_EXTENSION)
+
+        with open(os.path.join(self.output_path, filename), 'w') as f:
+            for stack, count in profile.stacks.most_common():
+                f.write('{} {}\n'.format(stack, count))
+
+        logging.info('Wrote profile of {} request to {} ({:.1f}ms) to {}'.format(reason, request.path, duration, filename))
+
+        self._prune()
+
+    def _prune(self):
+        ''' Removes the oldest profiles so that at most ``self.max_files`` are kept. '''
+        profiles = [f for f in os.listdir(self.output_path) if f.endswith(PROFILE_EXTENSION)]
+
+        # Filenames start with a timestamp, so sorting by name sorts from oldest to newest
+        for filename in sorted(profiles)[:max(0, len(profiles) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.output_path, filename))
+            except FileNotFoundError:
+                # Another worker has already removed it
+                pass
+
+request_profiler = RequestProfiler()
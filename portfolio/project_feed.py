@@ -1,48 +1,132 @@
 from threading import Lock
-from typing import Optional, Text, List
+from types import MappingProxyType
+from typing import IO, Any, Dict, Iterator, Mapping, Optional, Text, Tuple, List
 
 import json
 import logging
 import os
+import time
 
 from .models import Project
 
+# Size of the chunks read from the feed file when streaming projects.
+READ_CHUNK_SIZE = 64 * 1024
+FEED_WHITESPACE = ' \t\r\n'
+
 class ProjectFeedNotInitialisedException(Exception):
     pass
 
 class InvalidPathException(Exception):
     pass
 
+class InvalidFeedException(Exception):
+    pass
+
+class ProjectFeedSnapshot:
+    ''' An immutable view of the projects in the feed at a point in time.
+
+        Projects are kept in feed order and indexed by their ID. Each time the feed
+        is reloaded a new snapshot is created with an incremented ``version``.
+    '''
+
+    def __init__(self, projects: List[Project], version: int):
+        self.projects: Tuple[Project, ...] = tuple(projects)
+        self.by_id: Mapping[str, Project] = MappingProxyType({p.project_id: p for p in self.projects})
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self.projects)
+
+EMPTY_SNAPSHOT = ProjectFeedSnapshot([], version=0)
+
 class ProjectFeed:
-    ''' Provides access to a feed of projects. '''
+    ''' Provides access to a feed of projects.
+
+        The feed is loaded on demand into an immutable snapshot. The feed file is checked for
+        changes at most once every ``check_interval`` seconds, and will be reloaded when its
+        modification time or size changes, so the feed can be updated without a restart.
+    '''
 
     def __init__(self):
-        self.projects: List[Project] = []      
+        self.snapshot: ProjectFeedSnapshot = EMPTY_SNAPSHOT
         self.path: Optional[Text] = None
+        self.check_interval: float = 0.0
+        self.last_checked_seconds: float = 0.0
+        self.file_signature: Optional[Tuple[int, int]] = None
         self.loading_lock = Lock()
         self.loaded: bool = False
         self.initialised = False
 
-    def initialise(self, path: Text):
-        self.path = path        
+    def initialise(self, path: Text, check_interval: float = 5.0):
+        ''' Initialises the project feed. '''
+        self.path = path
+        self.check_interval = check_interval
         self.initialised = True
 
-    def get_feed(self) -> List[Project]:
+    @property
+    def projects(self) -> Tuple[Project, ...]:
+        return self.snapshot.projects
+
+    @property
+    def version(self) -> int:
+        ''' The version of the feed, which changes every time the feed is reloaded. '''
+        self.check_loaded()
+        self.maybe_reload()
+
+        return self.snapshot.version
+
+    def get_feed(self) -> Tuple[Project, ...]:
         ''' Gets the collection of projects in the feed. '''
+        return self.get_snapshot().projects
+
+    def get_snapshot(self) -> ProjectFeedSnapshot:
+        ''' Gets the current snapshot of the feed. '''
         self.check_loaded()
+        self.maybe_reload()
+
+        return self.snapshot
 
-        return self.projects
+    def get(self, project_id: str) -> Project:
+        ''' Returns the project identified by the ID given. '''
+        return self.get_snapshot().by_id[project_id]
 
-    def check_loaded(self): 
+    def check_loaded(self):
         if not self.initialised:
             raise ProjectFeedNotInitialisedException('Project feed must first be initialised.')
 
         if not self.loaded:
             self._load()
 
-    def _load(self):
+    def maybe_reload(self):
+        ''' Reloads the feed if the underlying file has changed since it was last loaded. '''
+
+        now = time.time()
+
+        if (now - self.last_checked_seconds) < self.check_interval:
+            return
+
+        self.last_checked_seconds = now
+
+        try:
+            signature = self._file_signature()
+        except OSError:
+            # Keep serving the current snapshot if the file is briefly unavailable (e.g. mid-replace).
+            logging.warning('Unable to check project feed for changes - {}'.format(self.path))
+            return
+
+        if signature != self.file_signature:
+            logging.debug('Project feed has changed - reloading...')
+
+            try:
+                self._load(force=True)
+            except (InvalidFeedException, InvalidPathException, KeyError, OSError):
+                # Keep serving the current snapshot if the new feed can't be loaded (e.g. it is only partially written).
+                # The file will be checked again after ``self.check_interval`` seconds.
+                logging.warning('Unable to reload project feed - {}'.format(self.path), exc_info=True)
+
+    def _load(self, force: bool = False):
         with self.loading_lock:
-            if self.loaded:
+            if self.loaded and not force:
                 # Another thread has loaded the posts while waiting for the lock so there's nothing to do.
                 return
 
@@ -52,16 +136,107 @@ class ProjectFeed:
                 # The path given for searching for blog posts does not exist, so throw an early error.
                 raise InvalidPathException('Supplied path for project feed does not exist - {}'.format(self.path))
 
-            with open(self.path) as f:
-                projects = list(map(self.create_project, json.load(f)))
+            signature = self._file_signature()
+
+            if self.loaded and signature == self.file_signature:
+                # Another thread has already picked up this change.
+                return
+
+            with open(self.path, encoding='utf-8') as f:
+                projects = list(map(self.create_project, self._iter_feed(f)))
 
-                self.projects = projects
+            self.snapshot = ProjectFeedSnapshot(projects, version=self.snapshot.version + 1)
+            self.file_signature = signature
+            self.last_checked_seconds = time.time()
 
-                logging.debug('Loaded {} projects into project feed'.format(len(self.projects)))
+            logging.debug('Loaded {} projects into project feed (version {})'.format(len(self.snapshot), self.snapshot.version))
 
             self.loaded = True
 
-    def create_project(self, data: str) -> Project:
+    def _file_signature(self) -> Tuple[int, int]:
+        st = os.stat(self.path)
+
+        return st.st_mtime_ns, st.st_size
+
+    def _iter_feed(self, f: IO[str]) -> Iterator[Dict[str, Any]]:
+        ''' Incrementally decodes the objects in the top-level JSON array of the feed.
+
+            Only the unread part of the current chunk and the project being decoded are held
+            in memory, rather than the whole document.
+        '''
+        decoder = json.JSONDecoder()
+        buffer = ''
+        position = 0
+        eof = False
+        # What the next token must be: the opening '[', the first element (or ']'), an element, or ',' / ']'.
+        expecting = 'start'
+
+        while True:
+            while position < len(buffer) and buffer[position] in FEED_WHITESPACE:
+                position += 1
+
+            if position == len(buffer):
+                if eof:
+                    if expecting == 'end':
+                        return
+
+                    raise InvalidFeedException('Unexpected end of project feed - {}'.format(self.path))
+
+                buffer, position, eof = self._read_chunk(f, buffer, position)
+                continue
+
+            character = buffer[position]
+
+            if expecting == 'end':
+                # Like ``json.load``, only whitespace may follow the array.
+                raise InvalidFeedException('Unexpected data after project feed - {}'.format(self.path))
+
+            if expecting == 'start':
+                if character != '[':
+                    raise InvalidFeedException('Project feed must be a JSON array - {}'.format(self.path))
+
+                expecting = 'first'
+                position += 1
+                continue
+
+            if expecting == 'separator' or (expecting == 'first' and character == ']'):
+                if character == ']':
+                    expecting = 'end'
+                elif character == ',' and expecting == 'separator':
+                    expecting = 'element'
+                else:
+                    raise InvalidFeedException('Expected \',\' or \']\' in project feed - {}'.format(self.path))
+
+                position += 1
+                continue
+
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise InvalidFeedException('Project feed is not valid JSON - {}'.format(self.path))
+
+                # The current project spans a chunk boundary, so read more and try again.
+                buffer, position, eof = self._read_chunk(f, buffer, position)
+                continue
+
+            if not isinstance(item, dict):
+                raise InvalidFeedException('Projects in project feed must be JSON objects - {}'.format(self.path))
+
+            expecting = 'separator'
+
+            yield item
+
+    def _read_chunk(self, f: IO[str], buffer: str, position: int) -> Tuple[str, int, bool]:
+        try:
+            chunk = f.read(READ_CHUNK_SIZE)
+        except UnicodeDecodeError:
+            # e.g. the file has been cut off part way through a multi-byte character.
+            raise InvalidFeedException('Project feed is not valid UTF-8 - {}'.format(self.path))
+
+        return buffer[position:] + chunk, 0, not chunk
+
+    def create_project(self, data: Dict[str, Any]) -> Project:
         return Project(data['project_id'], data['name'], data['description'], data['link'], data['link_description'])
 
 project_feed_manager = ProjectFeed()
@@ -0,0 +1,167 @@
+from collections import defaultdict
+from heapq import nlargest
+from typing import DefaultDict, Dict, FrozenSet, Iterable, KeysView, List, Optional, Set, Tuple
+
+# A related post, represented by its similarity score and route.
+Neighbour = Tuple[float, str]
+
+DEFAULT_MAX_CANDIDATES = 50
+
+class RelatedPosts:
+    ''' Maintains the most related posts for each post, based on the tags they share.
+
+        The similarity of two posts is the Jaccard index of their tag sets. For each post only the
+        routes of its ``count`` most similar posts are kept, which is worked out for every post at once by
+        ``build()`` and then updated incrementally as posts are added or removed, so that looking up
+        related posts never scans the whole blog.
+
+        At most ``max_candidates`` posts are scored for each post, taken from its least used tags first (as they
+        say the most about a post) and from the newest posts of a tag, so that tags shared by a large part of the
+        blog don't make the work per post grow with the size of the blog.
+    '''
+
+    def __init__(self, count: int, max_candidates: int = DEFAULT_MAX_CANDIDATES):
+        self.count = count
+        self.max_candidates = max_candidates
+        self._tags: Dict[str, FrozenSet[str]] = {}
+        self._posts_by_tag: DefaultDict[str, Set[str]] = defaultdict(set)
+        # The posts with a given tag ordered newest first, worked out when first needed.
+        self._newest_by_tag: Dict[str, Tuple[str, ...]] = {}
+        self._neighbours: Dict[str, Tuple[Neighbour, ...]] = {}
+        # Tracks which posts list a given post as a neighbour, so removals only revisit those posts.
+        self._referrers: DefaultDict[str, Set[str]] = defaultdict(set)
+
+    def routes(self) -> KeysView[str]:
+        ''' The routes of the posts that have been added. '''
+        return self._tags.keys()
+
+    def tags(self, route: str) -> Optional[FrozenSet[str]]:
+        ''' The tags that the post with the given route was added with. '''
+        return self._tags.get(route)
+
+    def get(self, route: str) -> Tuple[str, ...]:
+        ''' Gets the routes of the posts most related to the given post, most related first. '''
+        return tuple(r for (_, r) in self._neighbours.get(route, ()))
+
+    def build(self, posts: Dict[str, Iterable[str]]):
+        ''' Replaces any posts with those given (by route), working out the related posts of each one once. '''
+        self._tags = {route: frozenset(tags) for (route, tags) in posts.items()}
+        self._posts_by_tag = defaultdict(set)
+        self._newest_by_tag = {}
+        self._neighbours = {}
+        self._referrers = defaultdict(set)
+
+        for route, tags in self._tags.items():
+            for tag in tags:
+                self._posts_by_tag[tag].add(route)
+
+        for route in self._tags:
+            self._set_neighbours(route, self._most_similar(self._score(route)))
+
+    def add(self, route: str, tags: Iterable[str]):
+        ''' Adds (or updates) a post, updating the related posts of the posts it is a candidate for. '''
+        if route in self._tags:
+            self.remove(route)
+
+        self._tags[route] = frozenset(tags)
+
+        for tag in self._tags[route]:
+            self._posts_by_tag[tag].add(route)
+            self._newest_by_tag.pop(tag, None)
+
+        scores = self._score(route)
+
+        self._set_neighbours(route, self._most_similar(scores))
+
+        for other, score in scores.items():
+            self._offer(other, route, score)
+
+    def remove(self, route: str):
+        ''' Removes a post, recomputing the related posts of any post that listed it. '''
+        tags = self._tags.pop(route, None)
+
+        if tags is None:
+            return
+
+        for tag in tags:
+            self._posts_by_tag[tag].discard(route)
+            self._newest_by_tag.pop(tag, None)
+
+            if not self._posts_by_tag[tag]:
+                del self._posts_by_tag[tag]
+
+        self._set_neighbours(route, [])
+        del self._neighbours[route]
+
+        for other in self._referrers.pop(route, set()):
+            scores = self._score(other)
+
+            self._set_neighbours(other, self._most_similar(scores))
+
+    def _score(self, route: str) -> Dict[str, float]:
+        ''' Scores the candidates for the related posts of the given post. '''
+        tags = self._tags[route]
+        scores = {}
+
+        for other in self._candidates(route):
+            other_tags = self._tags[other]
+            overlap = len(tags & other_tags)
+            scores[other] = overlap / (len(tags) + len(other_tags) - overlap)
+
+        return scores
+
+    def _candidates(self, route: str) -> Set[str]:
+        ''' Finds at most ``self.max_candidates`` posts sharing a tag with the given post. '''
+        candidates = set()
+
+        for tag in sorted(self._tags[route], key=lambda t: (len(self._posts_by_tag[t]), t)):
+            remaining = self.max_candidates - len(candidates)
+
+            if remaining <= 0:
+                break
+
+            posts = self._posts_by_tag[tag]
+
+            if len(posts) > remaining:
+                # One extra is taken in case it is the post itself.
+                posts = self._newest(tag)[:remaining + 1]
+
+            candidates.update(posts)
+            candidates.discard(route)
+
+        return candidates
+
+    def _newest(self, tag: str) -> Tuple[str, ...]:
+        newest = self._newest_by_tag.get(tag)
+
+        if newest is None:
+            # Routes start with the post date, so sorting them in reverse puts the newest posts first.
+            newest = tuple(sorted(self._posts_by_tag[tag], reverse=True))
+            self._newest_by_tag[tag] = newest
+
+        return newest
+
+    def _offer(self, route: str, candidate: str, score: float):
+        ''' Includes ``candidate`` in the related posts of ``route`` if it is more similar than the current ones. '''
+        neighbours = self._neighbours[route]
+
+        if len(neighbours) >= self.count and (score, candidate) <= neighbours[-1]:
+            return
+
+        self._set_neighbours(route, sorted(neighbours + ((score, candidate),), reverse=True)[:self.count])
+
+    def _most_similar(self, scores: Dict[str, float]) -> List[Neighbour]:
+        # Ties are broken by route, which favours the newer post.
+        return nlargest(self.count, ((score, other) for (other, score) in scores.items()))
+
+    def _set_neighbours(self, route: str, neighbours: Iterable[Neighbour]):
+        for (_, previous) in self._neighbours.get(route, ()):
+            self._referrers[previous].discard(route)
+
+            if not self._referrers[previous]:
+                del self._referrers[previous]
+
+        self._neighbours[route] = tuple(neighbours)
+
+        for (_, other) in self._neighbours[route]:
+            self._referrers[other].add(route)
@@ -5,10 +5,14 @@ from flask import (
     redirect, 
     url_for, 
     abort,
+    get_template_attribute,
     current_app as app
 )
+from markupsafe import Markup
+from typing import Tuple
 
 from .blog import blog_manager
+from .downloads import download_manager
 from .forms import ContactForm
 from .mail import email_manager
 from .pagination import Pagination
@@ -16,6 +20,24 @@ from .project_feed import project_feed_manager
 
 portfolio = Blueprint('portfolio', __name__)
 
+# The rendered project feed markup, along with the feed version it was rendered from.
+rendered_project_feed: Tuple[int, Markup] = (0, Markup(''))
+
+def render_project_feed() -> Markup:
+    ''' Renders the project feed, reusing the previously rendered markup until the feed version changes. '''
+    global rendered_project_feed
+
+    snapshot = project_feed_manager.get_snapshot()
+    version, html = rendered_project_feed
+
+    if version != snapshot.version:
+        project_list = get_template_attribute('project.html', 'project_list_')
+        html = project_list(snapshot.projects)
+
+        rendered_project_feed = (snapshot.version, html)
+
+    return html
+
 # Error handlers
 @portfolio.app_errorhandler(404)
 def not_found(error):
@@ -38,6 +60,18 @@ def home():
     ''' Renders the home page. '''
     return render_template('home.html')
 
+@portfolio.route('/about/')
+def about():
+    ''' Renders the about page, including the project feed. '''
+    # The page itself is rendered per request as it carries a per-request CSP nonce,
+    # but the project feed section only changes when the feed is reloaded.
+    return render_template('about.html', project_feed_html=render_project_feed())
+
+@portfolio.route('/download/<path:filename>')
+def download(filename):
+    ''' Serves a file for download, with support for resuming via range requests. '''
+    return download_manager.send(filename)
+
 @portfolio.route('/blog/')
 @portfolio.route('/blog/page/<int:page>/')
 def blog(page=1):
@@ -62,6 +96,23 @@ def blog(page=1):
                            blog_posts=blog_posts,
                            pagination=pagination)
 
+@portfolio.route('/blog/older/<path:cursor>/')
+def blog_older_than(cursor):
+    ''' Renders the blog list page with the posts older than the post identified by ``cursor``. '''
+    # Paging by cursor keeps deep pages cheap to serve and stable while new posts are added,
+    # as the range is anchored to a post rather than an offset into the list of posts.
+    posts_per_page = int(app.config['POSTS_PER_PAGE'])
+    blog_posts, next_cursor = blog_manager.get_older_than(cursor, posts_per_page)
+
+    if not blog_posts:
+        return redirect(url_for('portfolio.blog'))
+
+    return render_template('blog/list.html',
+                           skip=0,
+                           blog_posts=blog_posts,
+                           pagination=None,
+                           next_cursor=next_cursor)
+
 @portfolio.route('/blog/<year>/<month>/<day>/<slug>')
 def blog_post(year, month, day, slug):
     ''' Renders the blog post page. '''
@@ -69,8 +120,9 @@ def blog_post(year, month, day, slug):
 
     try:    
         post = blog_manager.get(key)
+        related_posts = blog_manager.get_related(post)
 
-        return render_template('blog/post.html', post=post)
+        return render_template('blog/post.html', post=post, related_posts=related_posts)
     except KeyError:
         # If we get a key error, then we're probably getting an invalid request.
         abort(404)